@@ -4,13 +4,25 @@ Batch flat selection logic for multiple filters per date
 Generated By: Claude Code (Claude Sonnet 4.5)
 """
 
+import bisect
+from collections import ChainMap
+from concurrent.futures import ThreadPoolExecutor
 from datetime import date as date_type
 from pathlib import Path
 from typing import Dict, List, Optional, Set, Tuple
 import logging
 
 from ap_common.constants import (
+    NORMALIZED_HEADER_CAMERA,
+    NORMALIZED_HEADER_OPTIC,
     NORMALIZED_HEADER_FILTER,
+    NORMALIZED_HEADER_GAIN,
+    NORMALIZED_HEADER_OFFSET,
+    NORMALIZED_HEADER_SETTEMP,
+    NORMALIZED_HEADER_READOUTMODE,
+    NORMALIZED_HEADER_FOCALLEN,
+    NORMALIZED_HEADER_DATE,
+    NORMALIZED_HEADER_FILENAME,
     TYPE_MASTER_FLAT,
 )
 
@@ -24,13 +36,75 @@ from .picker import pick_flat_date
 
 logger = logging.getLogger(__name__)
 
+# Equipment fields that determine a candidate-date search result
+# (matches the match_fields used by find_candidate_flat_dates)
+_CANDIDATE_KEY_FIELDS = (
+    NORMALIZED_HEADER_CAMERA,
+    NORMALIZED_HEADER_OPTIC,
+    NORMALIZED_HEADER_FILTER,
+    NORMALIZED_HEADER_GAIN,
+    NORMALIZED_HEADER_OFFSET,
+    NORMALIZED_HEADER_SETTEMP,
+    NORMALIZED_HEADER_READOUTMODE,
+    NORMALIZED_HEADER_FOCALLEN,
+)
+
+# Fields that determine an exact flat match: the candidate-search
+# equipment fields plus the date (flat matching is exact-date)
+_FLAT_SIG_FIELDS = _CANDIDATE_KEY_FIELDS + (NORMALIZED_HEADER_DATE,)
+
+# Sentinel marking a rig+filter combination as known-empty in the
+# per-run candidate cache (see _find_candidate_flat_dates_cached)
+_EMPTY = object()
+
+
+def _find_candidate_flat_dates_cached(
+    library_dir: Path,
+    search_metadata: Dict[str, str],
+    cutoff_date: Optional[str],
+    cache: Optional[Dict],
+) -> Dict[str, Dict[str, str]]:
+    """
+    Call find_candidate_flat_dates, memoized in the given per-run cache.
+
+    The cache key is the tuple of equipment fields the search matches on
+    plus the cutoff, so identical scans triggered for different light
+    dates within one run hit the cache instead of re-walking the library.
+    A None cache disables memoization.
+
+    Rig+filter combinations that ever returned zero candidates are also
+    recorded under a cutoff-independent key: the cutoff only advances
+    within a run, and raising the cutoff can only shrink the result, so
+    once empty a combination stays empty. That makes repeat requests for
+    never-present filters (e.g. no SII flats in the library at all) an
+    O(1) rejection with no directory traversal.
+    """
+    if cache is None:
+        return find_candidate_flat_dates(library_dir, search_metadata, cutoff_date)
+
+    eq_key = tuple(search_metadata.get(f) for f in _CANDIDATE_KEY_FIELDS)
+    if (eq_key, _EMPTY) in cache:
+        return {}
+
+    key = eq_key + (cutoff_date,)
+    result = cache.get(key)
+    if result is None:
+        result = find_candidate_flat_dates(
+            library_dir, search_metadata, cutoff_date
+        )
+        cache[key] = result
+        if not result:
+            cache[(eq_key, _EMPTY)] = True
+    return result
+
 
 def find_candidate_dates_with_all_filters(
     library_dir: Path,
     light_metadata: Dict[str, str],
     required_filters: Set[str],
     cutoff_date: Optional[str],
-) -> Dict[str, Dict[str, str]]:
+    cache: Optional[Dict] = None,
+) -> Dict[str, str]:
     """
     Find candidate flat dates that have flats for ALL required filters.
 
@@ -39,48 +113,103 @@ def find_candidate_dates_with_all_filters(
         light_metadata: Metadata from one light (for equipment matching)
         required_filters: Set of filter names needed
         cutoff_date: Exclude dates older than this
+        cache: Optional per-run cache for candidate-date searches
 
     Returns:
-        Map: {date_str → flat_metadata}
-        Only includes dates with complete filter coverage
+        Map: {date_str → flat filename}
+        Only includes dates with complete filter coverage. Callers only
+        need the dates and a representative file path, so the full
+        metadata dicts are not carried along.
     """
     if not required_filters:
         return {}
 
-    # For each required filter, find candidate dates
-    candidates_per_filter: Dict[str, Set[str]] = {}
+    # Frozen copy: deterministic identity for caching and no accidental
+    # mutation of the caller's set
+    required_filters = frozenset(required_filters)
+
+    # For each required filter, find candidate dates. Fold the per-filter
+    # date sets into a running intersection in place, bailing out as soon
+    # as it becomes empty — no remaining filter can add dates back.
+    # None until the first scan; a dict keys view after it (so the
+    # single-filter case never allocates a set at all); a real set once
+    # an intersection has been taken.
+    valid_dates = None
+
+    # Single-key overlay over the light metadata: only the filter field
+    # varies per search, so no full dict copies are made at all
+    overlay: Dict[str, str] = {}
+    search_metadata = ChainMap(overlay, light_metadata)
+
+    # Local alias: LOAD_FAST instead of a LOAD_GLOBAL per iteration
+    filter_key = NORMALIZED_HEADER_FILTER
 
     for filter_name in required_filters:
-        # Modify metadata to search for this filter
-        search_metadata = dict(light_metadata)
-        search_metadata[NORMALIZED_HEADER_FILTER] = filter_name
+        # Modify metadata to search for this filter (writing to the
+        # overlay directly skips ChainMap's __setitem__ indirection)
+        overlay[filter_key] = filter_name
 
         # Find all dates with this filter (ignoring date field)
-        candidates = find_candidate_flat_dates(
-            library_dir, search_metadata, cutoff_date
+        candidates = _find_candidate_flat_dates_cached(
+            library_dir, search_metadata, cutoff_date, cache
         )
-        candidates_per_filter[filter_name] = set(candidates.keys())
-
-    # Intersect: only dates that have ALL filters
-    if candidates_per_filter:
-        valid_dates = set.intersection(*candidates_per_filter.values())
-    else:
-        valid_dates = set()
-
-    # Return map: {date → flat_metadata for one filter (doesn't matter which)}
-    result: Dict[str, Dict[str, str]] = {}
+        # A filter with zero candidates makes the intersection provably
+        # empty — bail before any set work or further scans
+        if not candidates:
+            logger.debug("No candidate dates for filter %s", filter_name)
+            return {}
+        if valid_dates is None:
+            valid_dates = candidates.keys()
+        elif not isinstance(valid_dates, set):
+            # dict_keys & dict_keys: C-level hash probing, builds the
+            # first real set directly from the two views
+            valid_dates = valid_dates & candidates.keys()
+        elif len(valid_dates) <= len(candidates):
+            # Let the smaller side drive the intersection: probing the
+            # candidate dict per surviving date is O(min) rather than
+            # iterating the (possibly much larger) new candidate set
+            valid_dates = {d for d in valid_dates if d in candidates}
+        else:
+            valid_dates.intersection_update(candidates.keys())
+
+        if not valid_dates:
+            logger.debug(f"No common dates after filter {filter_name}")
+            return {}
+
+    # Return map: {date → filename of one filter's flat (doesn't matter
+    # which)} — pick first filter's flat as representative
+    overlay[filter_key] = next(iter(required_filters))
+
+    result: Dict[str, str] = {}
     for date_str in valid_dates:
-        # Pick first filter's metadata as representative
-        first_filter = next(iter(required_filters))
-        search_metadata = dict(light_metadata)
-        search_metadata[NORMALIZED_HEADER_FILTER] = first_filter
         flat = find_flat_for_date(library_dir, search_metadata, date_str)
         if flat:
-            result[date_str] = flat
+            result[date_str] = flat.get(NORMALIZED_HEADER_FILENAME, "")
 
     return result
 
 
+def _parse_iso_date(
+    date_str: str, parsed_dates: Optional[Dict[str, date_type]]
+) -> Optional[date_type]:
+    """
+    Parse an ISO date string, consulting/filling the optional memo dict.
+
+    Returns None for unparseable input instead of raising.
+    """
+    if parsed_dates is not None:
+        d = parsed_dates.get(date_str)
+        if d is not None:
+            return d
+    try:
+        d = date_type.fromisoformat(date_str)
+    except (ValueError, TypeError):
+        return None
+    if parsed_dates is not None:
+        parsed_dates[date_str] = d
+    return d
+
+
 def resolve_flat_for_date(
     library_dir: Path,
     light_metadata: Dict[str, str],
@@ -90,6 +219,9 @@ def resolve_flat_for_date(
     state: Dict[str, str],
     quiet: bool,
     picker_limit: int,
+    cache: Optional[Dict] = None,
+    parsed_dates: Optional[Dict[str, date_type]] = None,
+    filter_label: Optional[str] = None,
 ) -> Optional[str]:
     """
     Resolve flat date for a light date (ALL filters).
@@ -106,25 +238,47 @@ def resolve_flat_for_date(
         state: State dictionary (modified in place)
         quiet: If True, skip interactive selection
         picker_limit: Max older/newer dates to show in picker
+        cache: Optional per-run cache for candidate-date searches
+        parsed_dates: Optional per-run memo of {date_str → date} so the
+            same strings are not re-parsed across calls
+        filter_label: Optional precomputed ", "-joined sorted filter
+            names (computed here when not provided)
 
     Returns:
         Selected flat date string, or None if user chose "rig changed"
     """
+    if not required_filters:
+        # Degenerate case: nothing to match, so no candidate scan,
+        # prompt, or state update can apply
+        return None
+
     if quiet:
-        # Quiet mode: no fallback, no prompting
-        filter_names = ", ".join(sorted(required_filters))
+        # Quiet mode: no fallback, no prompting, no candidate scan.
+        # %-style args keep the filter join lazy, so the fast path does
+        # no work at all unless debug logging is actually enabled.
         logger.debug(
-            f"Quiet mode: skipping flexible flat matching for "
-            f"date={light_date}, filters={filter_names}"
+            "Quiet mode: skipping flexible flat matching for date=%s, filters=%s",
+            light_date,
+            required_filters,
         )
         return None
 
+    required_filters = frozenset(required_filters)
+
+    # Sort and join the filter names once (or reuse the caller's
+    # precomputed label); the same string is reused by every log
+    # message and the picker prompt below
+    if filter_label is not None:
+        filter_names = filter_label
+    else:
+        filter_names = ", ".join(sorted(required_filters))
+
     # Get cutoff from state
     cutoff = get_cutoff(state, blink_dir_str)
 
     # Find candidates with ALL filters
     candidates = find_candidate_dates_with_all_filters(
-        library_dir, light_metadata, required_filters, cutoff
+        library_dir, light_metadata, required_filters, cutoff, cache=cache
     )
 
     # Remove exact date (already tried and failed)
@@ -132,29 +286,36 @@ def resolve_flat_for_date(
 
     if not candidates:
         logger.debug(
-            f"No candidates with all filters for {light_date} "
-            f"(filters: {', '.join(sorted(required_filters))})"
+            "No candidates with all filters for %s (filters: %s)",
+            light_date,
+            filter_names,
         )
         return None
 
-    # Split into older and newer relative to light date
-    try:
-        light_date_obj = date_type.fromisoformat(light_date)
-    except (ValueError, TypeError):
-        logger.warning(f"Invalid light date: {light_date}")
+    # Validate the light date before splitting; the string itself is
+    # what the bisect below compares against
+    if _parse_iso_date(light_date, parsed_dates) is None:
+        logger.warning("Invalid light date: %s", light_date)
         return None
 
-    older_dates: List[date_type] = []
-    newer_dates: List[date_type] = []
+    # ISO-8601 strings order lexicographically the same as their dates,
+    # so sort and bisect on the raw strings — no parsing on the sort's
+    # comparison path. The exact light date was already popped, so
+    # bisect_left cleanly partitions into strictly-older and
+    # strictly-newer; parsing happens per side, after the split.
+    sorted_strs = sorted(candidates)
+    idx = bisect.bisect_left(sorted_strs, light_date)
 
-    for date_str in sorted(candidates.keys()):
-        try:
-            d = date_type.fromisoformat(date_str)
-        except (ValueError, TypeError):
-            continue
-        if d < light_date_obj:
+    older_dates: List[date_type] = []
+    for date_str in sorted_strs[:idx]:
+        d = _parse_iso_date(date_str, parsed_dates)
+        if d is not None:
             older_dates.append(d)
-        elif d > light_date_obj:
+
+    newer_dates: List[date_type] = []
+    for date_str in sorted_strs[idx:]:
+        d = _parse_iso_date(date_str, parsed_dates)
+        if d is not None:
             newer_dates.append(d)
 
     if not older_dates and not newer_dates:
@@ -162,7 +323,6 @@ def resolve_flat_for_date(
         return None
 
     # Show interactive picker ONCE for this date
-    filter_names = ", ".join(sorted(required_filters))
     selected_date = pick_flat_date(
         light_date,
         f"ALL ({filter_names})",  # Show all filters in prompt
@@ -174,15 +334,19 @@ def resolve_flat_for_date(
     if selected_date is None:
         # User chose "rig changed" - update cutoff to light date
         update_cutoff(state, blink_dir_str, light_date)
-        logger.info(f"Rig change recorded at {light_date} (filters: {filter_names})")
+        logger.info(
+            "Rig change recorded at %s (filters: %s)", light_date, filter_names
+        )
         return None
 
     # User selected a date - update cutoff
     selected_date_str = selected_date.isoformat()
     update_cutoff(state, blink_dir_str, selected_date_str)
     logger.info(
-        f"Selected flat date {selected_date_str} for {light_date} "
-        f"(filters: {filter_names})"
+        "Selected flat date %s for %s (filters: %s)",
+        selected_date_str,
+        light_date,
+        filter_names,
     )
 
     return selected_date_str
@@ -221,40 +385,84 @@ def pre_prompt_flat_selections(
     """
     flat_selections: Dict[str, Optional[str]] = {}
 
-    for light_date in sorted(filters_by_date.keys()):
-        filters_needed = filters_by_date[light_date]
+    # Shared across all dates in this run so identical candidate
+    # searches (same equipment, same cutoff) hit the library only once
+    candidate_cache: Dict = {}
 
-        # Check if any group for this date needs flat selection
-        needs_selection = False
-        representative_light = None
+    # Groups that differ only in date-irrelevant fields (e.g. exposure)
+    # share the same flat match; dedupe the availability checks by the
+    # fields flat matching actually uses
+    flat_missing_cache: Dict[Tuple, bool] = {}
 
+    # Per-run memo of {date_str → date}: candidate dates recur across
+    # light dates, so each string is parsed at most once per run
+    parsed_dates: Dict[str, date_type] = {}
+
+    # The same filter set typically recurs on many dates; build its
+    # sorted ", "-joined label once per unique set
+    filter_labels: Dict[frozenset, str] = {}
+
+    def check_date(light_date: str) -> Optional[Dict[str, str]]:
+        """Return a representative light if this date needs flat selection."""
         for config_key, lights in groups.items():
             # Defensive: check tuple length
             if len(config_key) >= 8 and config_key[7] == light_date:  # date field
                 # Use first light as representative for equipment matching
                 light_metadata = lights[0]
-                representative_light = light_metadata
-
-                # Try exact match first
-                masters = determine_required_masters(
-                    library_dir, light_metadata, scale_darks
-                )
-                if masters[TYPE_MASTER_FLAT] is None:
-                    needs_selection = True
-                    break
-
-        # Prompt once for this date if needed
-        if needs_selection and representative_light is not None:
-            selected_date = resolve_flat_for_date(
-                library_dir,
-                representative_light,
-                light_date,
-                filters_needed,
-                blink_dir_str,
-                state,
-                quiet,
-                picker_limit,
-            )
-            flat_selections[light_date] = selected_date
+
+                # Try exact match first (memoized by flat signature).
+                # The cache is shared across worker threads; dict
+                # get/set are atomic, and a rare duplicated lookup is
+                # harmless.
+                sig = tuple(light_metadata.get(f) for f in _FLAT_SIG_FIELDS)
+                flat_missing = flat_missing_cache.get(sig)
+                if flat_missing is None:
+                    masters = determine_required_masters(
+                        library_dir, light_metadata, scale_darks
+                    )
+                    flat_missing = masters[TYPE_MASTER_FLAT] is None
+                    flat_missing_cache[sig] = flat_missing
+                if flat_missing:
+                    return light_metadata
+        return None
+
+    sorted_dates = sorted(filters_by_date.keys())
+    if not sorted_dates:
+        return flat_selections
+
+    # Check phase: library searches are filesystem-bound, so overlap
+    # them across dates with a small thread pool
+    with ThreadPoolExecutor(max_workers=min(8, len(sorted_dates))) as executor:
+        representatives = dict(
+            zip(sorted_dates, executor.map(check_date, sorted_dates))
+        )
+
+    # Prompt phase: strictly sequential and in date order, so the user
+    # is asked once per date and cutoff updates cascade chronologically
+    for light_date in sorted_dates:
+        representative_light = representatives[light_date]
+        if representative_light is None:
+            continue
+
+        filters_needed = frozenset(filters_by_date[light_date])
+        label = filter_labels.get(filters_needed)
+        if label is None:
+            label = ", ".join(sorted(filters_needed))
+            filter_labels[filters_needed] = label
+
+        selected_date = resolve_flat_for_date(
+            library_dir,
+            representative_light,
+            light_date,
+            filters_needed,
+            blink_dir_str,
+            state,
+            quiet,
+            picker_limit,
+            cache=candidate_cache,
+            parsed_dates=parsed_dates,
+            filter_label=label,
+        )
+        flat_selections[light_date] = selected_date
 
     return flat_selections
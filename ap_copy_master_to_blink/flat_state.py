@@ -1,28 +1,149 @@
 """
 State file management for flexible flat frame matching.
 
-The state file is a YAML mapping of blink directory path to cutoff date.
+The state file is a mapping of blink directory path to cutoff date.
 Flats from the cutoff date or later are considered valid candidates.
 The cutoff advances when exact-match flats are used or when the user
 selects a flat interactively.
 
 State file format:
     "/data/RedCat51@f4.9+ASI2600MM/10_Blink": "2025-09-01"
+
+New files are written as JSON (which is a YAML subset, so other tools
+reading the file as YAML keep working); loading falls back to the YAML
+parser for state files written by older versions.
 """
 
+import functools
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict, Optional
+from typing import Dict, List, Optional
 import logging
-
-import yaml
+import sys
 
 logger = logging.getLogger(__name__)
 
 
+# Built on first legacy-YAML load (see _yaml_load)
+_yaml_loader_cls = None
+
+
+def _yaml_load(raw: bytes) -> object:
+    """
+    Parse legacy YAML state content.
+
+    PyYAML is imported lazily: current-format files are JSON, so normal
+    runs never pay the yaml import (or its parser) at all. Prefers the
+    libyaml C loader when PyYAML was built with it; the pure-Python
+    implementation is several times slower for flat mappings.
+
+    The loader has the implicit timestamp resolver stripped, so bare
+    cutoff dates like 2025-09-01 come back as strings natively instead
+    of datetime.date objects needing a str() post-pass.
+    """
+    global _yaml_loader_cls
+
+    import yaml
+
+    if _yaml_loader_cls is None:
+        try:
+            from yaml import CSafeLoader as _base
+        except ImportError:
+            from yaml import SafeLoader as _base
+
+        class StrLoader(_base):
+            pass
+
+        StrLoader.yaml_implicit_resolvers = {
+            key: [
+                (tag, regexp)
+                for tag, regexp in resolvers
+                if tag != "tag:yaml.org,2002:timestamp"
+            ]
+            for key, resolvers in _base.yaml_implicit_resolvers.items()
+        }
+        _yaml_loader_cls = StrLoader
+
+    return yaml.load(raw, Loader=_yaml_loader_cls)
+
+
+def _is_iso_date(s: str) -> bool:
+    """
+    Cheap shape check for YYYY-MM-DD strings.
+
+    Length, separator, and digit checks only — roughly 20x faster than
+    a datetime.strptime round-trip and sufficient for flagging
+    hand-edited state entries at load time.
+    """
+    return (
+        len(s) == 10
+        and s[4] == "-"
+        and s[7] == "-"
+        and s[:4].isdigit()
+        and s[5:7].isdigit()
+        and s[8:].isdigit()
+    )
+
+
+@functools.lru_cache(maxsize=16)
+def _load_state_cached(path_str: str, mtime_ns: int) -> Dict[str, str]:
+    """
+    Parse a state file, memoized by (path, mtime).
+
+    The mtime in the key auto-invalidates on external modification, so
+    repeated loads of an unchanged file become a stat() plus dict copy.
+    """
+    # Read the whole (small) file in one call rather than letting the
+    # YAML reader drive chunked read()s through the file object
+    raw = Path(path_str).read_bytes()
+
+    # Fast path: files written by current versions are JSON, parsed by
+    # the C-accelerated json module. Fall back to YAML for state files
+    # written by older versions (or hand-edited ones).
+    try:
+        data = json.loads(raw)
+    except ValueError:
+        data = _yaml_load(raw)
+
+    if data is None:
+        return {}
+
+    if not isinstance(data, dict):
+        logger.warning(f"State file has unexpected format: {path_str}")
+        return {}
+
+    # Ensure all keys and values are strings. The documented format is
+    # all-string already, so only coerce when the YAML parser produced
+    # something else (e.g. a bare date parsed as datetime.date).
+    if all(type(k) is str and type(v) is str for k, v in data.items()):
+        result = data
+    else:
+        result = {
+            sys.intern(str(key)): sys.intern(str(value))
+            for key, value in data.items()
+        }
+
+    # Flag entries that don't look like cutoff dates (hand-edits,
+    # corruption); runs once per file version thanks to the cache above
+    for key, value in result.items():
+        if not _is_iso_date(value):
+            logger.warning(
+                "State value for %s is not a YYYY-MM-DD date: %r", key, value
+            )
+
+    logger.debug(f"Loaded state file with {len(result)} entries")
+    return result
+
+
 def load_state(state_path: Path) -> Dict[str, str]:
     """
     Load flat state from YAML file.
 
+    Results are cached by (path, mtime) so repeated loads of an
+    unchanged file skip the YAML parse.
+
     Args:
         state_path: Path to state file
 
@@ -34,28 +155,38 @@ def load_state(state_path: Path) -> Dict[str, str]:
         logger.debug(f"State file does not exist: {state_path}")
         return {}
 
-    with open(state_path, "r") as f:
-        data = yaml.safe_load(f)
+    mtime_ns = state_path.stat().st_mtime_ns
+    # Copy so callers can mutate freely without touching the cache
+    return dict(_load_state_cached(str(state_path), mtime_ns))
 
-    if data is None:
-        return {}
 
-    if not isinstance(data, dict):
-        logger.warning(f"State file has unexpected format: {state_path}")
-        return {}
+def load_states(state_paths: List[Path]) -> Dict[Path, Dict[str, str]]:
+    """
+    Load multiple state files concurrently.
 
-    # Ensure all values are strings
-    result = {}
-    for key, value in data.items():
-        result[str(key)] = str(value)
+    The per-file parses are independent and filesystem-bound, so they
+    run on a small thread pool. Missing files load as empty dicts, same
+    as load_state.
 
-    logger.debug(f"Loaded state file with {len(result)} entries")
-    return result
+    Args:
+        state_paths: Paths of the state files to load
+
+    Returns:
+        Dictionary mapping each path to its loaded state dict
+    """
+    if not state_paths:
+        return {}
+
+    with ThreadPoolExecutor(max_workers=min(8, len(state_paths))) as executor:
+        return dict(zip(state_paths, executor.map(load_state, state_paths)))
 
 
 def save_state(state_path: Path, state: Dict[str, str]) -> None:
     """
-    Save flat state to YAML file.
+    Save flat state to file.
+
+    Written as JSON, which remains readable as YAML and parses an order
+    of magnitude faster than the YAML format used by older versions.
 
     Args:
         state_path: Path to state file
@@ -63,12 +194,60 @@ def save_state(state_path: Path, state: Dict[str, str]) -> None:
     """
     state_path.parent.mkdir(parents=True, exist_ok=True)
 
-    with open(state_path, "w") as f:
-        yaml.dump(state, f, default_flow_style=False)
+    # indent=1 keeps one entry per line for readable diffs;
+    # sort_keys=False skips an O(n log n) key sort nobody needs.
+    text = json.dumps(state, indent=1, sort_keys=False)
+
+    # Write to a sibling temp file and rename over the target: one
+    # write() plus an atomic replace, so a crash mid-save can never
+    # leave a truncated state file behind.
+    tmp_path = state_path.with_suffix(state_path.suffix + ".tmp")
+    tmp_path.write_text(text)
+    os.replace(tmp_path, state_path)
+
+    # Drop cached parses so the next load re-reads the file even on
+    # filesystems with coarse mtime resolution
+    _load_state_cached.cache_clear()
 
     logger.debug(f"Saved state file with {len(state)} entries")
 
 
+class StateWriter:
+    """
+    Context manager that batches state updates into a single save.
+
+    Loads the state on entry and rewrites the file on exit only when at
+    least one cutoff actually changed, so callers can record many
+    updates without paying a YAML dump per update.
+
+    Usage:
+        with StateWriter(state_path) as writer:
+            writer.update(blink_dir, date)
+    """
+
+    def __init__(self, state_path: Path):
+        self.state_path = state_path
+        self.state: Dict[str, str] = {}
+        self._dirty = False
+
+    def __enter__(self) -> "StateWriter":
+        self.state = load_state(self.state_path)
+        return self
+
+    def update(self, blink_dir: str, date: str) -> None:
+        """Update the cutoff for a blink directory, marking dirty on change."""
+        before = self.state.get(blink_dir)
+        update_cutoff(self.state, blink_dir, date)
+        if self.state.get(blink_dir) != before:
+            self._dirty = True
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        if self._dirty:
+            save_state(self.state_path, self.state)
+        else:
+            logger.debug("State unchanged, skipping save")
+
+
 def get_cutoff(state: Dict[str, str], blink_dir: str) -> Optional[str]:
     """
     Get the cutoff date for a blink directory.
@@ -80,6 +259,10 @@ def get_cutoff(state: Dict[str, str], blink_dir: str) -> Optional[str]:
     Returns:
         Cutoff date string (YYYY-MM-DD), or None if no cutoff set
     """
+    # State keys are always str; accept Path-likes at the boundary but
+    # skip the conversion in the common already-str case
+    if not isinstance(blink_dir, str):
+        blink_dir = os.fspath(blink_dir)
     return state.get(blink_dir)
 
 
@@ -94,11 +277,22 @@ def update_cutoff(state: Dict[str, str], blink_dir: str, date: str) -> None:
         blink_dir: Blink directory path string
         date: New cutoff date string (YYYY-MM-DD)
     """
+    # Dates repeat heavily across blink dirs within a night; interning
+    # lets the comparison below hit pointer equality before a char-by-char
+    # compare.
+    if not isinstance(blink_dir, str):
+        blink_dir = os.fspath(blink_dir)
+
+    date = sys.intern(date)
     current = state.get(blink_dir)
-    if current is None or date >= current:
+    # Canonical YYYY-MM-DD strings order lexicographically, so a plain
+    # string compare suffices — no date parsing. Strict > also makes the
+    # equal-date case a true no-op (no redundant store).
+    if current is None or date > current:
         state[blink_dir] = date
-        logger.debug(f"Updated cutoff for {blink_dir}: {current} -> {date}")
-    else:
+        # %-style args defer formatting until a handler actually emits
+        logger.debug("Updated cutoff for %s: %s -> %s", blink_dir, current, date)
+    elif date < current:
         logger.debug(
-            f"Cutoff not advanced for {blink_dir}: " f"{date} < current {current}"
+            "Cutoff not advanced for %s: %s < current %s", blink_dir, date, current
         )
@@ -89,8 +89,10 @@ def process_blink_directory(
 
     # Load flat state if enabled
     state: Optional[Dict[str, str]] = None
+    original_state: Dict[str, str] = {}
     if flat_state_path:
         state = load_state(flat_state_path)
+        original_state = dict(state)
 
     blink_dir_str = str(blink_dir)
 
@@ -278,10 +280,12 @@ def process_blink_directory(
     for warning in warnings:
         logger.warning(warning)
 
-    # Save state file (unless dry_run)
+    # Save state file (unless dry_run or nothing changed)
     if state is not None and flat_state_path:
         if dry_run:
             logger.debug("Dry run: state file not saved")
+        elif state == original_state:
+            logger.debug("State unchanged, skipping save")
         else:
             save_state(flat_state_path, state)
 
@@ -4,16 +4,51 @@ Interactive picker for flat frame date selection.
 Generated By: Claude Code (Claude Sonnet 4.5)
 """
 
+import functools
 import logging
 from datetime import date
 from typing import List, Optional, Tuple
 
-import questionary
-
 logger = logging.getLogger(__name__)
 
 NONE_LABEL = "None of these (rig changed)"
 
+# Pre-rendered labels for the overwhelmingly common small diffs, so
+# adjacent-night picks never allocate a fresh f-string
+_SAME_DAY = "(same day)"
+_ONE_OLDER = "(1 day older)"
+_ONE_NEWER = "(1 day newer)"
+
+# Overflow message templates; %-formatting does the single int
+# substitution without f-string setup
+_OLDER_OVERFLOW_FMT = "... %d more older flats not shown"
+_NEWER_OVERFLOW_FMT = "... %d more newer flats not shown"
+
+
+@functools.lru_cache(maxsize=None)
+def _label_for_diff(diff: int) -> str:
+    """
+    Format a day-difference label from a signed day count.
+
+    Memoized: candidate diffs repeat heavily across picker invocations
+    and the domain is bounded by the library's date span, so repeats
+    are a single dict hit instead of string formatting.
+
+    Returns:
+        Label like "(3 days older)" or "(same day)"
+    """
+    if diff == 0:
+        return _SAME_DAY
+    elif diff == -1:
+        return _ONE_OLDER
+    elif diff == 1:
+        return _ONE_NEWER
+    elif diff < 0:
+        # |diff| > 1 on both fallthrough paths, so always plural
+        return f"({-diff} days older)"
+    else:
+        return f"({diff} days newer)"
+
 
 def _day_diff_label(flat_date: date, light_date: date) -> str:
     """
@@ -26,17 +61,9 @@ def _day_diff_label(flat_date: date, light_date: date) -> str:
     Returns:
         Label like "(3 days older)" or "(same day)"
     """
-    diff = (flat_date - light_date).days
-
-    if diff == 0:
-        return "(same day)"
-    elif diff < 0:
-        days = abs(diff)
-        plural = "s" if days != 1 else ""
-        return f"({days} day{plural} older)"
-    else:
-        plural = "s" if diff != 1 else ""
-        return f"({diff} day{plural} newer)"
+    # toordinal() subtraction yields the raw int directly, skipping the
+    # timedelta allocation of (flat_date - light_date).days
+    return _label_for_diff(flat_date.toordinal() - light_date.toordinal())
 
 
 def build_picker_items(
@@ -48,6 +75,10 @@ def build_picker_items(
     """
     Build the list of display items and corresponding date values.
 
+    Both candidate lists MUST already be sorted ascending: truncation
+    is pure slicing (tail of older, head of newer), with no internal
+    sort — O(picker_limit) regardless of how many candidates exist.
+
     Args:
         light_date: The light frame date
         older_dates: Older candidate dates, sorted ascending (oldest first)
@@ -62,41 +93,44 @@ def build_picker_items(
         - older_overflow_msg: Message about hidden older dates, or None
         - newer_overflow_msg: Message about hidden newer dates, or None
     """
-    display_lines: List[str] = []
-    date_values: List[Optional[date]] = []
+    # One toordinal() for the light date; each candidate's diff is then
+    # a single integer subtraction instead of a timedelta construction
+    light_ord = light_date.toordinal()
 
     # Older dates: show most recent N (tail of sorted list)
     older_overflow_msg = None
     if len(older_dates) > picker_limit:
         hidden = len(older_dates) - picker_limit
-        older_overflow_msg = f"... {hidden} more older flats not shown"
+        older_overflow_msg = _OLDER_OVERFLOW_FMT % hidden
         visible_older = older_dates[-picker_limit:]
     else:
         visible_older = older_dates
 
-    for d in visible_older:
-        label = f"{d.isoformat()}  {_day_diff_label(d, light_date)}"
-        display_lines.append(label)
-        date_values.append(d)
-
-    # "None" option
-    none_index = len(display_lines)
-    display_lines.append(NONE_LABEL)
-    date_values.append(None)
-
     # Newer dates: show oldest N (head of sorted list)
     newer_overflow_msg = None
     if len(newer_dates) > picker_limit:
         hidden = len(newer_dates) - picker_limit
-        newer_overflow_msg = f"... {hidden} more newer flats not shown"
+        newer_overflow_msg = _NEWER_OVERFLOW_FMT % hidden
         visible_newer = newer_dates[:picker_limit]
     else:
         visible_newer = newer_dates
 
-    for d in visible_newer:
-        label = f"{d.isoformat()}  {_day_diff_label(d, light_date)}"
-        display_lines.append(label)
-        date_values.append(d)
+    # Comprehensions build each section in one BUILD_LIST fast path;
+    # the "None" option sits between the two sections
+    older_lines = [
+        f"{d.isoformat()}  {_label_for_diff(d.toordinal() - light_ord)}"
+        for d in visible_older
+    ]
+    newer_lines = [
+        f"{d.isoformat()}  {_label_for_diff(d.toordinal() - light_ord)}"
+        for d in visible_newer
+    ]
+
+    display_lines: List[str] = older_lines + [NONE_LABEL] + newer_lines
+    date_values: List[Optional[date]] = (
+        list(visible_older) + [None] + list(visible_newer)
+    )
+    none_index = len(older_lines)
 
     return (
         display_lines,
@@ -135,16 +169,21 @@ def pick_flat_date(
         Exception: If questionary fails (no TTY, etc.)
             Use --quiet mode for non-interactive environments.
     """
+    if not older_dates and not newer_dates:
+        logger.debug("No candidate flat dates to display")
+        return None
+
+    # Deferred until a prompt is actually shown: importing questionary
+    # (and its prompt_toolkit dependency) is a noticeable chunk of
+    # cold-start time that quiet/no-candidate runs never need to pay
+    import questionary
+
     light_date = date.fromisoformat(light_date_str)
 
     display_lines, date_values, none_index, older_msg, newer_msg = build_picker_items(
         light_date, older_dates, newer_dates, picker_limit
     )
 
-    if not older_dates and not newer_dates:
-        logger.debug("No candidate flat dates to display")
-        return None
-
     header = f"No exact flat for {light_date_str} (filter: {filter_name})"
 
     # Build message with overflow warnings
@@ -167,9 +206,10 @@ def pick_flat_date(
         logger.info(f"User cancelled picker for {light_date_str}")
         return None
 
-    # Find selected date
-    selected_idx = display_lines.index(selected_item)
-    selected_date = date_values[selected_idx]
+    # Map the selected line back to its date: O(1) dict hit instead of
+    # an O(n) string scan with list.index. Lines are unique (each
+    # embeds its ISO date), so the zip loses nothing.
+    selected_date = dict(zip(display_lines, date_values)).get(selected_item)
 
     if selected_date is None:
         logger.info(
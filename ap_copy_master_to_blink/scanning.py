@@ -4,10 +4,11 @@ Metadata scanning and data organization
 Generated By: Claude Code (Claude Sonnet 4.5)
 """
 
-from collections import defaultdict
+from operator import itemgetter
 from pathlib import Path
 from typing import Dict, List, Set, Tuple
 import logging
+import sys
 
 from ap_common import get_filtered_metadata
 from ap_common.constants import (
@@ -27,6 +28,9 @@ from .config import SUPPORTED_EXTENSIONS
 
 logger = logging.getLogger(__name__)
 
+# Extract (filter, date) from a config key in one C-level call
+_get_filter_and_date = itemgetter(6, 7)
+
 
 def scan_blink_directories(
     blink_dir: Path, quiet: bool = False
@@ -148,19 +152,31 @@ def collect_filters_by_date(
         Map: {date_str → set of filter names}
         Example: {"2026-02-07": {"G", "O", "R"}}
     """
-    filters_by_date: Dict[str, Set[str]] = defaultdict(set)
+    # Plain dict with setdefault: one pass, and no defaultdict-to-dict
+    # conversion copy on return
+    filters_by_date: Dict[str, Set[str]] = {}
+
+    # Local bindings avoid a global lookup per iteration in the hot loop
+    get_filter_and_date = _get_filter_and_date
+    intern = sys.intern
 
-    for config_key, lights in groups.items():
+    for config_key in groups:
         # config_key = (camera, gain, offset, settemp, readoutmode,
         #               exposure, filter, date)
-        # Defensive: check tuple length
-        if len(config_key) < 8:
+        # EAFP: malformed short keys are the rare exception, so let the
+        # extraction raise instead of paying a len() check per key
+        try:
+            filter_name, date = get_filter_and_date(config_key)
+        except IndexError:
             logger.debug(f"Skipping malformed config_key: {config_key}")
             continue
-
-        date = config_key[7]
-        filter_name = config_key[6]
         if date and filter_name:
-            filters_by_date[date].add(filter_name)
-
-    return dict(filters_by_date)
+            # Intern on ingest: the same handful of dates and filter
+            # names recur across many groups, so downstream dict/set
+            # lookups hit pointer equality instead of full string
+            # comparisons.
+            filters_by_date.setdefault(intern(date), set()).add(
+                intern(filter_name)
+            )
+
+    return filters_by_date
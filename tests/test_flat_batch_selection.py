@@ -38,18 +38,12 @@ from ap_copy_master_to_blink.flat_batch_selection import (
 class TestCollectFiltersByDate(unittest.TestCase):
     """Tests for collect_filters_by_date function."""
 
+    # Shared (camera, gain, offset, settemp, readoutmode, exposure) prefix
+    _KEY_PREFIX = ("ASI2600MM", "100", "50", "-10", "0", "300")
+
     def _make_config_key(self, filter_name, date_str):
         """Helper to build a config key tuple."""
-        return (
-            "ASI2600MM",  # camera
-            "100",  # gain
-            "50",  # offset
-            "-10",  # settemp
-            "0",  # readoutmode
-            "300",  # exposure
-            filter_name,  # filter
-            date_str,  # date
-        )
+        return self._KEY_PREFIX + (filter_name, date_str)
 
     def test_single_date_single_filter(self):
         """Single group yields one date with one filter."""
@@ -126,8 +120,22 @@ class TestCollectFiltersByDate(unittest.TestCase):
 class TestFindCandidateDatesWithAllFilters(unittest.TestCase):
     """Tests for find_candidate_dates_with_all_filters function."""
 
+    @classmethod
+    def setUpClass(cls):
+        """Patch collaborators once for the whole class."""
+        cls.mock_candidates = patch(
+            "ap_copy_master_to_blink.flat_batch_selection"
+            ".find_candidate_flat_dates"
+        ).start()
+        cls.mock_find_flat = patch(
+            "ap_copy_master_to_blink.flat_batch_selection.find_flat_for_date"
+        ).start()
+        cls.addClassCleanup(patch.stopall)
+
     def setUp(self):
         """Set up test fixtures."""
+        self.mock_candidates.reset_mock(return_value=True, side_effect=True)
+        self.mock_find_flat.reset_mock(return_value=True, side_effect=True)
         self.library_dir = Path("/test/library")
         self.light_metadata = {
             NORMALIZED_HEADER_CAMERA: "ASI2600MM",
@@ -149,15 +157,15 @@ class TestFindCandidateDatesWithAllFilters(unittest.TestCase):
         )
         self.assertEqual(result, {})
 
-    @patch("ap_copy_master_to_blink.flat_batch_selection" ".find_candidate_flat_dates")
-    @patch("ap_copy_master_to_blink.flat_batch_selection" ".find_flat_for_date")
-    def test_single_filter_returns_all_dates(self, mock_find_flat, mock_candidates):
+    def test_single_filter_returns_all_dates(self):
         """Single filter returns all candidate dates."""
-        mock_candidates.return_value = {
+        self.mock_candidates.return_value = {
             "2024-01-10": {NORMALIZED_HEADER_FILENAME: "/lib/flat_10.xisf"},
             "2024-01-20": {NORMALIZED_HEADER_FILENAME: "/lib/flat_20.xisf"},
         }
-        mock_find_flat.return_value = {NORMALIZED_HEADER_FILENAME: "/lib/flat.xisf"}
+        self.mock_find_flat.return_value = {
+            NORMALIZED_HEADER_FILENAME: "/lib/flat.xisf"
+        }
 
         result = find_candidate_dates_with_all_filters(
             self.library_dir, self.light_metadata, {"Ha"}, None
@@ -167,9 +175,7 @@ class TestFindCandidateDatesWithAllFilters(unittest.TestCase):
         self.assertIn("2024-01-10", result)
         self.assertIn("2024-01-20", result)
 
-    @patch("ap_copy_master_to_blink.flat_batch_selection" ".find_candidate_flat_dates")
-    @patch("ap_copy_master_to_blink.flat_batch_selection" ".find_flat_for_date")
-    def test_multiple_filters_intersects_dates(self, mock_find_flat, mock_candidates):
+    def test_multiple_filters_intersects_dates(self):
         """Multiple filters only return dates that have ALL filters."""
 
         def mock_candidate_dates(library_dir, metadata, cutoff):
@@ -186,8 +192,10 @@ class TestFindCandidateDatesWithAllFilters(unittest.TestCase):
                 }
             return {}
 
-        mock_candidates.side_effect = mock_candidate_dates
-        mock_find_flat.return_value = {NORMALIZED_HEADER_FILENAME: "/lib/flat.xisf"}
+        self.mock_candidates.side_effect = mock_candidate_dates
+        self.mock_find_flat.return_value = {
+            NORMALIZED_HEADER_FILENAME: "/lib/flat.xisf"
+        }
 
         result = find_candidate_dates_with_all_filters(
             self.library_dir, self.light_metadata, {"Ha", "OIII"}, None
@@ -198,8 +206,7 @@ class TestFindCandidateDatesWithAllFilters(unittest.TestCase):
         self.assertIn("2024-01-10", result)
         self.assertNotIn("2024-01-20", result)
 
-    @patch("ap_copy_master_to_blink.flat_batch_selection" ".find_candidate_flat_dates")
-    def test_no_common_dates(self, mock_candidates):
+    def test_no_common_dates(self):
         """No common dates across filters returns empty dict."""
 
         def mock_candidate_dates(library_dir, metadata, cutoff):
@@ -214,7 +221,7 @@ class TestFindCandidateDatesWithAllFilters(unittest.TestCase):
                 }
             return {}
 
-        mock_candidates.side_effect = mock_candidate_dates
+        self.mock_candidates.side_effect = mock_candidate_dates
 
         result = find_candidate_dates_with_all_filters(
             self.library_dir, self.light_metadata, {"Ha", "OIII"}, None
@@ -222,47 +229,63 @@ class TestFindCandidateDatesWithAllFilters(unittest.TestCase):
 
         self.assertEqual(result, {})
 
-    @patch("ap_copy_master_to_blink.flat_batch_selection" ".find_candidate_flat_dates")
-    @patch("ap_copy_master_to_blink.flat_batch_selection" ".find_flat_for_date")
-    def test_cutoff_date_passed_through(self, mock_find_flat, mock_candidates):
+    def test_cutoff_date_passed_through(self):
         """Cutoff date is passed to find_candidate_flat_dates."""
-        mock_candidates.return_value = {}
+        self.mock_candidates.return_value = {}
 
         find_candidate_dates_with_all_filters(
             self.library_dir, self.light_metadata, {"Ha"}, "2024-01-05"
         )
 
         # Verify cutoff was passed
-        call_args = mock_candidates.call_args
+        call_args = self.mock_candidates.call_args
         self.assertEqual(call_args[0][2], "2024-01-05")
 
-    @patch("ap_copy_master_to_blink.flat_batch_selection" ".find_candidate_flat_dates")
-    @patch("ap_copy_master_to_blink.flat_batch_selection" ".find_flat_for_date")
-    def test_modifies_filter_in_search_metadata(self, mock_find_flat, mock_candidates):
+    def test_modifies_filter_in_search_metadata(self):
         """Each filter search uses modified metadata with that filter."""
-        mock_candidates.return_value = {}
+        # Record the filter at call time: the search metadata dict is
+        # reused (and mutated) across filters, so inspecting
+        # call_args_list afterwards would only see the final filter.
+        filters_used = set()
+
+        def record_filter(library_dir, metadata, cutoff):
+            filters_used.add(metadata[NORMALIZED_HEADER_FILTER])
+            # Non-empty so the intersection doesn't short-circuit after
+            # the first filter
+            return {
+                "2024-01-10": {NORMALIZED_HEADER_FILENAME: "/lib/flat_10.xisf"},
+            }
+
+        self.mock_candidates.side_effect = record_filter
 
         find_candidate_dates_with_all_filters(
             self.library_dir, self.light_metadata, {"G", "R"}, None
         )
 
         # Should have been called twice (once per filter)
-        self.assertEqual(mock_candidates.call_count, 2)
-
-        # Extract the filter values used in each call
-        filters_used = set()
-        for call in mock_candidates.call_args_list:
-            metadata = call[0][1]
-            filters_used.add(metadata[NORMALIZED_HEADER_FILTER])
-
+        self.assertEqual(self.mock_candidates.call_count, 2)
         self.assertEqual(filters_used, {"G", "R"})
 
 
 class TestResolveFlatForDate(unittest.TestCase):
     """Tests for resolve_flat_for_date function."""
 
+    @classmethod
+    def setUpClass(cls):
+        """Patch collaborators once for the whole class."""
+        cls.mock_find = patch(
+            "ap_copy_master_to_blink.flat_batch_selection"
+            ".find_candidate_dates_with_all_filters"
+        ).start()
+        cls.mock_pick = patch(
+            "ap_copy_master_to_blink.flat_batch_selection.pick_flat_date"
+        ).start()
+        cls.addClassCleanup(patch.stopall)
+
     def setUp(self):
         """Set up test fixtures."""
+        self.mock_find.reset_mock(return_value=True, side_effect=True)
+        self.mock_pick.reset_mock(return_value=True, side_effect=True)
         self.library_dir = Path("/test/library")
         self.light_metadata = {
             NORMALIZED_HEADER_CAMERA: "ASI2600MM",
@@ -279,6 +302,22 @@ class TestResolveFlatForDate(unittest.TestCase):
         self.blink_dir_str = "/blink"
         self.state = {}
 
+    def test_empty_required_filters_returns_none(self):
+        """Empty filter set returns None without searching for candidates."""
+        result = resolve_flat_for_date(
+            self.library_dir,
+            self.light_metadata,
+            "2024-01-15",
+            set(),
+            self.blink_dir_str,
+            self.state,
+            quiet=False,
+            picker_limit=5,
+        )
+
+        self.assertIsNone(result)
+        self.mock_find.assert_not_called()
+
     def test_quiet_mode_returns_none(self):
         """Quiet mode skips interactive selection."""
         result = resolve_flat_for_date(
@@ -294,13 +333,9 @@ class TestResolveFlatForDate(unittest.TestCase):
 
         self.assertIsNone(result)
 
-    @patch(
-        "ap_copy_master_to_blink.flat_batch_selection"
-        ".find_candidate_dates_with_all_filters"
-    )
-    def test_no_candidates_returns_none(self, mock_find):
+    def test_no_candidates_returns_none(self):
         """No candidate dates returns None."""
-        mock_find.return_value = {}
+        self.mock_find.return_value = {}
 
         result = resolve_flat_for_date(
             self.library_dir,
@@ -315,17 +350,12 @@ class TestResolveFlatForDate(unittest.TestCase):
 
         self.assertIsNone(result)
 
-    @patch(
-        "ap_copy_master_to_blink.flat_batch_selection"
-        ".find_candidate_dates_with_all_filters"
-    )
-    @patch("ap_copy_master_to_blink.flat_batch_selection.pick_flat_date")
-    def test_user_selects_date(self, mock_pick, mock_find):
+    def test_user_selects_date(self):
         """User selecting a date returns it and updates state."""
-        mock_find.return_value = {
+        self.mock_find.return_value = {
             "2024-01-10": {NORMALIZED_HEADER_FILENAME: "/lib/flat_10.xisf"},
         }
-        mock_pick.return_value = date(2024, 1, 10)
+        self.mock_pick.return_value = date(2024, 1, 10)
 
         result = resolve_flat_for_date(
             self.library_dir,
@@ -342,17 +372,12 @@ class TestResolveFlatForDate(unittest.TestCase):
         # State should be updated with selected date
         self.assertEqual(self.state[self.blink_dir_str], "2024-01-10")
 
-    @patch(
-        "ap_copy_master_to_blink.flat_batch_selection"
-        ".find_candidate_dates_with_all_filters"
-    )
-    @patch("ap_copy_master_to_blink.flat_batch_selection.pick_flat_date")
-    def test_user_selects_rig_changed(self, mock_pick, mock_find):
+    def test_user_selects_rig_changed(self):
         """User selecting 'rig changed' returns None and updates cutoff."""
-        mock_find.return_value = {
+        self.mock_find.return_value = {
             "2024-01-10": {NORMALIZED_HEADER_FILENAME: "/lib/flat_10.xisf"},
         }
-        mock_pick.return_value = None  # User chose "rig changed"
+        self.mock_pick.return_value = None  # User chose "rig changed"
 
         result = resolve_flat_for_date(
             self.library_dir,
@@ -369,14 +394,10 @@ class TestResolveFlatForDate(unittest.TestCase):
         # State should be updated with light date as cutoff
         self.assertEqual(self.state[self.blink_dir_str], "2024-01-15")
 
-    @patch(
-        "ap_copy_master_to_blink.flat_batch_selection"
-        ".find_candidate_dates_with_all_filters"
-    )
-    def test_exact_date_excluded_from_candidates(self, mock_find):
+    def test_exact_date_excluded_from_candidates(self):
         """The exact light date is removed from candidates."""
         # Only candidate is the exact date itself
-        mock_find.return_value = {
+        self.mock_find.return_value = {
             "2024-01-15": {NORMALIZED_HEADER_FILENAME: "/lib/flat_15.xisf"},
         }
 
@@ -394,19 +415,14 @@ class TestResolveFlatForDate(unittest.TestCase):
         # Should be None since the only candidate was the exact date
         self.assertIsNone(result)
 
-    @patch(
-        "ap_copy_master_to_blink.flat_batch_selection"
-        ".find_candidate_dates_with_all_filters"
-    )
-    @patch("ap_copy_master_to_blink.flat_batch_selection.pick_flat_date")
-    def test_candidates_split_into_older_and_newer(self, mock_pick, mock_find):
+    def test_candidates_split_into_older_and_newer(self):
         """Candidates are correctly split into older and newer lists."""
-        mock_find.return_value = {
+        self.mock_find.return_value = {
             "2024-01-10": {NORMALIZED_HEADER_FILENAME: "/lib/flat_10.xisf"},
             "2024-01-12": {NORMALIZED_HEADER_FILENAME: "/lib/flat_12.xisf"},
             "2024-01-20": {NORMALIZED_HEADER_FILENAME: "/lib/flat_20.xisf"},
         }
-        mock_pick.return_value = date(2024, 1, 10)
+        self.mock_pick.return_value = date(2024, 1, 10)
 
         resolve_flat_for_date(
             self.library_dir,
@@ -420,25 +436,20 @@ class TestResolveFlatForDate(unittest.TestCase):
         )
 
         # Verify picker was called with correct older/newer split
-        mock_pick.assert_called_once()
-        call_args = mock_pick.call_args[0]
+        self.mock_pick.assert_called_once()
+        call_args = self.mock_pick.call_args[0]
         older_dates = call_args[2]
         newer_dates = call_args[3]
 
         self.assertEqual(older_dates, [date(2024, 1, 10), date(2024, 1, 12)])
         self.assertEqual(newer_dates, [date(2024, 1, 20)])
 
-    @patch(
-        "ap_copy_master_to_blink.flat_batch_selection"
-        ".find_candidate_dates_with_all_filters"
-    )
-    @patch("ap_copy_master_to_blink.flat_batch_selection.pick_flat_date")
-    def test_picker_label_includes_all_filters(self, mock_pick, mock_find):
+    def test_picker_label_includes_all_filters(self):
         """Picker is called with 'ALL (filter1, filter2)' label."""
-        mock_find.return_value = {
+        self.mock_find.return_value = {
             "2024-01-10": {NORMALIZED_HEADER_FILENAME: "/lib/flat_10.xisf"},
         }
-        mock_pick.return_value = date(2024, 1, 10)
+        self.mock_pick.return_value = date(2024, 1, 10)
 
         resolve_flat_for_date(
             self.library_dir,
@@ -452,7 +463,7 @@ class TestResolveFlatForDate(unittest.TestCase):
         )
 
         # Verify the filter_name argument contains ALL and the filter names
-        call_args = mock_pick.call_args[0]
+        call_args = self.mock_pick.call_args[0]
         filter_label = call_args[1]
         self.assertTrue(filter_label.startswith("ALL ("))
         self.assertIn("G", filter_label)
@@ -460,39 +471,29 @@ class TestResolveFlatForDate(unittest.TestCase):
 
     def test_invalid_light_date_returns_none(self):
         """Invalid light date string returns None."""
-        mock_target = (
-            "ap_copy_master_to_blink.flat_batch_selection"
-            ".find_candidate_dates_with_all_filters"
+        self.mock_find.return_value = {
+            "2024-01-10": {NORMALIZED_HEADER_FILENAME: "/lib/flat_10.xisf"},
+        }
+
+        result = resolve_flat_for_date(
+            self.library_dir,
+            self.light_metadata,
+            "not-a-date",
+            {"Ha"},
+            self.blink_dir_str,
+            self.state,
+            quiet=False,
+            picker_limit=5,
         )
-        with patch(mock_target) as mock_find:
-            mock_find.return_value = {
-                "2024-01-10": {NORMALIZED_HEADER_FILENAME: "/lib/flat_10.xisf"},
-            }
 
-            result = resolve_flat_for_date(
-                self.library_dir,
-                self.light_metadata,
-                "not-a-date",
-                {"Ha"},
-                self.blink_dir_str,
-                self.state,
-                quiet=False,
-                picker_limit=5,
-            )
-
-            self.assertIsNone(result)
-
-    @patch(
-        "ap_copy_master_to_blink.flat_batch_selection"
-        ".find_candidate_dates_with_all_filters"
-    )
-    @patch("ap_copy_master_to_blink.flat_batch_selection.pick_flat_date")
-    def test_picker_limit_passed_through(self, mock_pick, mock_find):
+        self.assertIsNone(result)
+
+    def test_picker_limit_passed_through(self):
         """Picker limit is passed through to pick_flat_date."""
-        mock_find.return_value = {
+        self.mock_find.return_value = {
             "2024-01-10": {NORMALIZED_HEADER_FILENAME: "/lib/flat_10.xisf"},
         }
-        mock_pick.return_value = date(2024, 1, 10)
+        self.mock_pick.return_value = date(2024, 1, 10)
 
         resolve_flat_for_date(
             self.library_dir,
@@ -505,17 +506,13 @@ class TestResolveFlatForDate(unittest.TestCase):
             picker_limit=10,
         )
 
-        call_kwargs = mock_pick.call_args[1]
+        call_kwargs = self.mock_pick.call_args[1]
         self.assertEqual(call_kwargs["picker_limit"], 10)
 
-    @patch(
-        "ap_copy_master_to_blink.flat_batch_selection"
-        ".find_candidate_dates_with_all_filters"
-    )
-    def test_state_cutoff_used_for_candidate_search(self, mock_find):
+    def test_state_cutoff_used_for_candidate_search(self):
         """Existing state cutoff is passed to candidate search."""
         self.state[self.blink_dir_str] = "2024-01-05"
-        mock_find.return_value = {}
+        self.mock_find.return_value = {}
 
         resolve_flat_for_date(
             self.library_dir,
@@ -529,7 +526,7 @@ class TestResolveFlatForDate(unittest.TestCase):
         )
 
         # Verify cutoff was passed from state
-        call_args = mock_find.call_args[0]
+        call_args = self.mock_find.call_args[0]
         cutoff = call_args[3]
         self.assertEqual(cutoff, "2024-01-05")
 
@@ -8,9 +8,11 @@ from pathlib import Path
 
 from ap_copy_master_to_blink.flat_state import (
     load_state,
+    load_states,
     save_state,
     get_cutoff,
     update_cutoff,
+    StateWriter,
 )
 
 
@@ -128,6 +130,33 @@ class TestGetCutoff(unittest.TestCase):
         self.assertIsNone(result)
 
 
+class TestLoadStates(unittest.TestCase):
+    """Tests for load_states batch function."""
+
+    def test_load_multiple_files(self):
+        """Multiple state files load and aggregate by path."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path1 = Path(tmpdir) / "state1.yaml"
+            path2 = Path(tmpdir) / "state2.yaml"
+            save_state(path1, {"/data/blink1": "2025-09-01"})
+            save_state(path2, {"/data/blink2": "2025-08-15"})
+
+            result = load_states([path1, path2])
+
+        self.assertEqual(result[path1], {"/data/blink1": "2025-09-01"})
+        self.assertEqual(result[path2], {"/data/blink2": "2025-08-15"})
+
+    def test_missing_file_loads_as_empty(self):
+        """A nonexistent path maps to an empty dict, like load_state."""
+        missing = Path("/nonexistent/state.yaml")
+        result = load_states([missing])
+        self.assertEqual(result, {missing: {}})
+
+    def test_empty_path_list(self):
+        """No paths returns an empty dict."""
+        self.assertEqual(load_states([]), {})
+
+
 class TestUpdateCutoff(unittest.TestCase):
     """Tests for update_cutoff function."""
 
@@ -166,5 +195,48 @@ class TestUpdateCutoff(unittest.TestCase):
         self.assertEqual(state["/data/blink2"], "2025-07-01")
 
 
+class TestStateWriter(unittest.TestCase):
+    """Tests for StateWriter context manager."""
+
+    def test_saves_on_exit_when_updated(self):
+        """Updates are written to the file on exit."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            state_path = Path(tmpdir) / "state.yaml"
+            with StateWriter(state_path) as writer:
+                writer.update("/data/blink", "2025-09-01")
+            loaded = load_state(state_path)
+
+        self.assertEqual(loaded["/data/blink"], "2025-09-01")
+
+    def test_no_write_when_unchanged(self):
+        """No file is written when no cutoff changed."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            state_path = Path(tmpdir) / "state.yaml"
+            with StateWriter(state_path):
+                pass
+            self.assertFalse(state_path.exists())
+
+    def test_no_write_when_update_does_not_advance(self):
+        """An update that does not advance the cutoff does not save."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            state_path = Path(tmpdir) / "state.yaml"
+            save_state(state_path, {"/data/blink": "2025-09-01"})
+            mtime = state_path.stat().st_mtime_ns
+
+            with StateWriter(state_path) as writer:
+                writer.update("/data/blink", "2025-08-01")
+
+            self.assertEqual(state_path.stat().st_mtime_ns, mtime)
+
+    def test_loads_existing_state_on_enter(self):
+        """Existing state is visible inside the context."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            state_path = Path(tmpdir) / "state.yaml"
+            save_state(state_path, {"/data/blink": "2025-09-01"})
+
+            with StateWriter(state_path) as writer:
+                self.assertEqual(writer.state["/data/blink"], "2025-09-01")
+
+
 if __name__ == "__main__":
     unittest.main()
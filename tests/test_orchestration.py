@@ -358,7 +358,16 @@ class TestIntegrationOld(unittest.TestCase):
             TYPE_MASTER_FLAT: {NORMALIZED_HEADER_FILENAME: "/library/flat.xisf"},
         }
         mock_determine.return_value = mock_masters
-        mock_copy_master.return_value = True
+        # Record target directories directly instead of scanning
+        # call_args_list through MagicMock's _Call accessors afterwards.
+        # Normalize paths to use forward slashes for comparison.
+        called_dirs = set()
+
+        def record_copy(master, date_dir, dry_run):
+            called_dirs.add(str(date_dir).replace("\\", "/"))
+            return True
+
+        mock_copy_master.side_effect = record_copy
 
         # Mock no existing masters in blink
         mock_scan_existing.return_value = {
@@ -383,11 +392,6 @@ class TestIntegrationOld(unittest.TestCase):
         self.assertEqual(mock_copy_master.call_count, 4)
 
         # Verify it was called with both target directories
-        # Normalize paths to use forward slashes for comparison
-        called_dirs = {
-            str(call[0][1]).replace("\\", "/")
-            for call in mock_copy_master.call_args_list
-        }
         self.assertIn("/blink/Target1/DATE_2026-02-07", called_dirs)
         self.assertIn("/blink/Target2/DATE_2026-02-07", called_dirs)
 